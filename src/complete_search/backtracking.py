@@ -4,6 +4,121 @@
 # 
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree. 
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from time import time
+from typing import Iterator, NamedTuple
+
+
+class QueensPrefix(NamedTuple):
+    """Valid placement of the first rows of the board, used as a work unit.
+
+    ``weight`` is the number of solutions each completion of this prefix
+    stands for once mirror images are folded together.
+    """
+    weight: int
+    placement: tuple[int, ...]
+    columns: int
+    left_diagonals: int
+    right_diagonals: int
+
+
+class QueensShard(NamedTuple):
+    placement: tuple[int, ...]
+    weight: int
+    count: int
+    seconds: float
+
+
+def _count_bitboard_completions(
+        full_mask: int, columns: int, left_diagonals: int,
+        right_diagonals: int) -> int:
+    """Count the ways to complete a board whose attacked cells are bitmasks.
+
+    Every argument is a row-relative bitmask: bit ``x`` of ``columns`` is set
+    when column ``x`` holds a queen, and the diagonal masks mark the cells of
+    the current row attacked along each diagonal. Moving to the next row is a
+    single shift of each diagonal mask, and the free cells of a row are
+    visited by extracting the lowest set bit instead of scanning
+    ``range(n)``.
+    """
+    if columns == full_mask:
+        return 1
+    count = 0
+    free = full_mask & ~(columns | left_diagonals | right_diagonals)
+    while free:
+        bit = free & -free
+        free ^= bit
+        if columns | bit == full_mask:
+            count += 1
+            continue
+        count += _count_bitboard_completions(
+            full_mask,
+            columns | bit,
+            ((left_diagonals | bit) << 1) & full_mask,
+            (right_diagonals | bit) >> 1,
+        )
+    return count
+
+
+def _bitboard_prefixes(n: int, depth: int) -> Iterator[QueensPrefix]:
+    """Yield every valid placement of the first ``depth`` rows.
+
+    Every solution with its first queen in the left half of the board has a
+    mirror image with its first queen in the right half, so only the left
+    half is expanded and those prefixes count twice. For odd n, the middle
+    column of the first row is its own mirror image; there, the second queen
+    can never be in the middle column either, so the same trick is applied
+    to the second row instead, and those prefixes are always at least two
+    rows deep.
+    """
+    full_mask = (1 << n) - 1
+
+    def expand(
+            weight: int, placement: tuple[int, ...], columns: int,
+            left_diagonals: int, right_diagonals: int,
+            allowed: int) -> Iterator[QueensPrefix]:
+        if columns == full_mask or (
+                len(placement) >= depth and allowed == full_mask):
+            yield QueensPrefix(
+                weight, placement, columns, left_diagonals, right_diagonals)
+            return
+        free = allowed & ~(columns | left_diagonals | right_diagonals)
+        while free:
+            bit = free & -free
+            free ^= bit
+            yield from expand(
+                weight,
+                placement + (bit.bit_length() - 1,),
+                columns | bit,
+                ((left_diagonals | bit) << 1) & full_mask,
+                (right_diagonals | bit) >> 1,
+                full_mask,
+            )
+
+    if n == 0:
+        yield QueensPrefix(1, (), 0, 0, 0)
+        return
+    yield from expand(2, (), 0, 0, 0, (1 << (n // 2)) - 1)
+    if n % 2 == 1:
+        middle = 1 << (n // 2)
+        if n == 1:
+            yield QueensPrefix(1, (0,), middle, 0, 0)
+            return
+        yield from expand(
+            2, (n // 2,), middle, (middle << 1) & full_mask, middle >> 1,
+            middle - 1)
+
+
+def _count_shard(full_mask: int, prefix: QueensPrefix) -> QueensShard:
+    start_time = time()
+    count = _count_bitboard_completions(
+        full_mask, prefix.columns, prefix.left_diagonals,
+        prefix.right_diagonals)
+    return QueensShard(
+        prefix.placement, prefix.weight, count, time() - start_time)
 
 
 class PlaceQueens:
@@ -16,6 +131,7 @@ class PlaceQueens:
     bottom_top_diagonals: set
     count: int
     n: int
+    shards: list[QueensShard]
 
 
     def _queen_in_top_bottom_diagonal(self, x: int, y: int) -> int:
@@ -43,6 +159,7 @@ class PlaceQueens:
         self.bottom_top_diagonals = set()
         self.count = 0
         self.n = 0
+        self.shards = []
     
     def _init_(self):
         self._reset()
@@ -63,10 +180,133 @@ class PlaceQueens:
             self._remove_queen(x, y)
 
 
-    def search(self, n: int) -> int:
+    def _search_bitboard(self) -> None:
+        """Count solutions with bitmasks, exploring half of the first row."""
+        full_mask = (1 << self.n) - 1
+        for prefix in _bitboard_prefixes(self.n, 1):
+            self.count += prefix.weight * _count_bitboard_completions(
+                full_mask, prefix.columns, prefix.left_diagonals,
+                prefix.right_diagonals)
+
+    def search(self, n: int, engine: str = "sets") -> int:
+        """Count the solutions for an n x n board.
+
+        ``engine`` selects the search algorithm: ``"sets"`` is the original
+        backtracking over sets of attacked lines, and ``"bitboard"`` stores
+        the attacked lines as integer bitmasks and exploits mirror symmetry.
+        """
+        self._reset()
+        self.n = n
+        if engine == "sets":
+            self._search(0)
+        elif engine == "bitboard":
+            self._search_bitboard()
+        else:
+            raise ValueError(f"Unknown engine: {engine}")
+        return self.count
+
+    def _save_checkpoint(
+            self, checkpoint_path: str, stack: list[tuple[int, int, int, int]],
+            placement: list[int]) -> None:
+        checkpoint = {
+            "n": self.n,
+            "count": self.count,
+            "stack": stack,
+            "placement": placement,
+        }
+        # Write to a temporary file first so that a run killed while saving
+        # never leaves a truncated checkpoint behind
+        temporary_path = f"{checkpoint_path}.tmp"
+        with open(temporary_path, "w") as checkpoint_file:
+            json.dump(checkpoint, checkpoint_file)
+        os.replace(temporary_path, checkpoint_path)
+
+    def iterate_solutions(
+            self, n: int, checkpoint_path: str | None = None,
+            checkpoint_every: int = 1000000) -> Iterator[tuple[int, ...]]:
+        """Yield every solution for an n x n board, one at a time.
+
+        A solution is a tuple whose item ``y`` is the column of the queen in
+        row ``y``. The search runs on an explicit stack of bitboard frames,
+        one per row, so memory stays O(n) however many solutions are
+        consumed.
+
+        When ``checkpoint_path`` is given, the stack is saved to that file
+        every ``checkpoint_every`` visited nodes, and a later call with the
+        same path resumes from it; solutions found after the last checkpoint
+        are yielded again. The file is removed once the search finishes.
+        ``count`` holds the number of solutions found so far, including those
+        found before resuming.
+        """
+        self._reset()
+        self.n = n
+        full_mask = (1 << n) - 1
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            with open(checkpoint_path) as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+            if checkpoint["n"] != n:
+                raise ValueError(
+                    f"Checkpoint is for n = {checkpoint['n']}, not n = {n}")
+            self.count = checkpoint["count"]
+            stack = [tuple(frame) for frame in checkpoint["stack"]]
+            placement = checkpoint["placement"]
+        elif n == 0:
+            self.count = 1
+            yield ()
+            return
+        else:
+            stack = [(0, 0, 0, full_mask)]
+            placement = []
+
+        nodes = 0
+        while stack:
+            columns, left_diagonals, right_diagonals, free = stack[-1]
+            if not free:
+                stack.pop()
+                if placement:
+                    placement.pop()
+                continue
+            bit = free & -free
+            stack[-1] = (columns, left_diagonals, right_diagonals, free ^ bit)
+            placement.append(bit.bit_length() - 1)
+            columns |= bit
+            if columns == full_mask:
+                self.count += 1
+                yield tuple(placement)
+                placement.pop()
+            else:
+                left_diagonals = ((left_diagonals | bit) << 1) & full_mask
+                right_diagonals = (right_diagonals | bit) >> 1
+                stack.append((
+                    columns, left_diagonals, right_diagonals,
+                    full_mask & ~(columns | left_diagonals | right_diagonals),
+                ))
+            nodes += 1
+            if checkpoint_path is not None and nodes % checkpoint_every == 0:
+                self._save_checkpoint(checkpoint_path, stack, placement)
+
+        if checkpoint_path is not None and os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+    def search_parallel(
+            self, n: int, workers: int | None = None,
+            prefix_depth: int = 2) -> int:
+        """Count the solutions for an n x n board using several processes.
+
+        The valid placements of the first ``prefix_depth`` rows are
+        independent work units. They are counted with the bitboard engine in
+        a pool of ``workers`` processes, one per CPU by default, and the
+        partial counts are added up. The count and running time of every
+        unit are kept in ``shards`` to make load imbalance visible.
+        """
         self._reset()
         self.n = n
-        self._search(0)
+        full_mask = (1 << n) - 1
+        prefixes = list(_bitboard_prefixes(n, prefix_depth))
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+            self.shards = list(executor.map(
+                partial(_count_shard, full_mask), prefixes))
+        self.count = sum(shard.weight * shard.count for shard in self.shards)
         return self.count
 
 
@@ -82,3 +322,31 @@ if __name__ == "__main__":
     print(f"This is what happens when n = {board_size}")
     print(pq.search(board_size))
     print("That was slow, wasn't it?")
+    print("Now let's store the attacked columns and diagonals as bits, and "
+          "only search half of the first row, since the board is symmetric.")
+    start_time = time()
+    print(pq.search(board_size, engine="bitboard"))
+    execution_time = time() - start_time
+    print(f"That took {execution_time} seconds.")
+    board_size = 14
+    print(f"This is fast enough to solve n = {board_size} too.")
+    start_time = time()
+    print(pq.search(board_size, engine="bitboard"))
+    execution_time = time() - start_time
+    print(f"That took {execution_time} seconds.")
+    print("Placements of the first rows are independent, so we can count "
+          "them in parallel, one process per CPU.")
+    start_time = time()
+    print(pq.search_parallel(board_size, prefix_depth=3))
+    execution_time = time() - start_time
+    print(f"That took {execution_time} seconds, split in {len(pq.shards)} "
+          "shards.")
+    shard_seconds = [shard.seconds for shard in pq.shards]
+    print(f"The fastest shard took {min(shard_seconds)} seconds and the "
+          f"slowest took {max(shard_seconds)} seconds.")
+    board_size = 8
+    print("We can also look at the actual boards. These are the first "
+          f"solutions for n = {board_size}:")
+    solutions = pq.iterate_solutions(board_size)
+    for _ in range(3):
+        print(next(solutions))
@@ -6,6 +6,14 @@
 # LICENSE file in the root directory of this source tree.
 """Generate all permutations for all numbers from 0 to n."""
 from itertools import permutations
+from math import factorial
+from time import time
+from typing import Iterator, Sequence
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 class RecursivePermutations:
     permutation: list
@@ -139,11 +147,176 @@ class RecursivePermutations:
         self._reset()
         return self._generate_recursive_permutations(n)
 
+    def iterate_heap_permutations(
+            self, n: int, copy: bool = False) -> Iterator[Sequence[int]]:
+        """Yield all permutations of all integers from 0 up to n-1 lazily.
+
+        Uses the iterative version of Heap's algorithm: every permutation is
+        obtained from the previous one with a single swap in ``permutation``,
+        which takes O(1) amortized time, and nothing else is kept in memory
+        but the ``c`` counters of the algorithm.
+
+        The same list is yielded every time and is modified in place
+        afterwards, so it must not be stored. With ``copy``, an immutable
+        tuple is yielded instead, which costs O(n) per permutation.
+        """
+        self.permutation = list(range(n))
+        permutation = self.permutation
+        c = [0] * n
+        yield tuple(permutation) if copy else permutation
+        i = 1
+        while i < n:
+            if c[i] < i:
+                j = c[i] if i % 2 == 1 else 0
+                permutation[i], permutation[j] = permutation[j], permutation[i]
+                yield tuple(permutation) if copy else permutation
+                c[i] += 1
+                i = 1
+            else:
+                c[i] = 0
+                i += 1
+
 
 def generate_itertools_permutations(n: int) -> list[tuple]:
     return [p for p in permutations(range(n))]
 
 
+class _FenwickTree:
+    """Prefix sums over the integers from 0 to n-1 still available."""
+    tree: list[int]
+
+    def __init__(self, n: int) -> None:
+        # Every position starts with a 1. Node i covers the i & -i positions
+        # ending at i, all of them ones
+        self.tree = [i & -i for i in range(n + 1)]
+
+    def remove(self, i: int) -> None:
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] -= 1
+            i += i & -i
+
+    def count_smaller(self, i: int) -> int:
+        count = 0
+        while i > 0:
+            count += self.tree[i]
+            i -= i & -i
+        return count
+
+    def find_kth(self, k: int) -> int:
+        """Find the k-th available integer, counting from 0."""
+        position = 0
+        step = 1 << (len(self.tree) - 1).bit_length()
+        while step:
+            if (position + step < len(self.tree)
+                    and self.tree[position + step] <= k):
+                position += step
+                k -= self.tree[position]
+            step >>= 1
+        return position
+
+
+def rank(permutation: Sequence[int]) -> int:
+    """Return the index of a permutation of 0 up to n-1 in lexicographic order.
+
+    The index is read from the Lehmer code of the permutation: digit ``i``
+    counts the items after position ``i`` that are smaller than it, in a
+    factorial number system. A Fenwick tree counts the smaller items still
+    unused in O(log n), so the rank takes O(n log n).
+    """
+    n = len(permutation)
+    available = _FenwickTree(n)
+    index = 0
+    for i, item in enumerate(permutation):
+        index = index * (n - i) + available.count_smaller(item)
+        available.remove(item)
+    return index
+
+
+def unrank(n: int, index: int) -> tuple[int, ...]:
+    """Return the permutation of 0 up to n-1 at a lexicographic index.
+
+    This is the inverse of ``rank``, in O(n log n).
+    """
+    if not 0 <= index < factorial(n):
+        raise ValueError(f"Index {index} out of range for n = {n}")
+    digits = []
+    for base in range(1, n + 1):
+        index, digit = divmod(index, base)
+        digits.append(digit)
+    available = _FenwickTree(n)
+    permutation = []
+    for digit in reversed(digits):
+        item = available.find_kth(digit)
+        available.remove(item)
+        permutation.append(item)
+    return tuple(permutation)
+
+
+def permutations_range(
+        n: int, start: int, stop: int | None = None) -> Iterator[tuple]:
+    """Yield the permutations from index ``start`` up to ``stop``, excluded.
+
+    The permutations follow the lexicographic order of
+    ``generate_itertools_permutations``. The first one is found with
+    ``unrank``, without walking the ones before it, and every following one
+    with an in-place next permutation step. This way the n! permutations can
+    be split in contiguous chunks for several workers.
+    """
+    total = factorial(n)
+    if stop is None or stop > total:
+        stop = total
+    if start >= stop:
+        return
+    permutation = list(unrank(n, start))
+    yield tuple(permutation)
+    for _ in range(stop - start - 1):
+        # Find the last ascent, swap it with the smallest larger item after
+        # it and reverse the descending tail
+        i = n - 2
+        while permutation[i] > permutation[i + 1]:
+            i -= 1
+        j = n - 1
+        while permutation[j] < permutation[i]:
+            j -= 1
+        permutation[i], permutation[j] = permutation[j], permutation[i]
+        permutation[i + 1:] = reversed(permutation[i + 1:])
+        yield tuple(permutation)
+
+
+
+def generate_numpy_permutation_batches(
+        n: int, batch_size: int = 65536) -> Iterator["np.ndarray"]:
+    """Yield all permutations of 0 up to n-1 as rows of NumPy matrices.
+
+    Every matrix holds ``batch_size`` consecutive permutations in
+    lexicographic order, except maybe the last one, so memory stays bounded
+    whatever n is. Rows are ``uint8``. Indices are ``int64``, which holds
+    every index up to 20! but not 21!, so n can't be larger than 20.
+
+    Each batch is built from its range of indices without Python loops over
+    the permutations. The indices are split into Lehmer code digits, and the
+    code is turned into permutations from right to left: every item is
+    bumped by one for each item to its left that is smaller or equal.
+    """
+    if np is None:
+        raise ImportError("NumPy is required to generate permutation batches")
+    if n > 20:
+        raise ValueError(
+            f"n = {n} is too large, the indices only fit int64 up to n = 20")
+    total = factorial(n)
+    for start in range(0, total, batch_size):
+        indices = np.arange(
+            start, min(start + batch_size, total), dtype=np.int64)
+        batch = np.empty((len(indices), n), dtype=np.uint8)
+        for i in range(n - 1, -1, -1):
+            indices, digits = np.divmod(indices, n - i)
+            batch[:, i] = digits
+        for i in range(n - 2, -1, -1):
+            batch[:, i + 1:] += batch[:, i + 1:] >= batch[:, i:i + 1]
+        yield batch
+
+
 if __name__ == "__main__":
     rp = RecursivePermutations()
     print("We can print all recursive permutations")
@@ -152,3 +325,38 @@ if __name__ == "__main__":
     print(rp.generate_recursive_permutations(3))
     print("Or just use itertools")
     print(generate_itertools_permutations(3))
+    print("Or walk them one at a time, swapping two items per step")
+    print([p for p in rp.iterate_heap_permutations(3, copy=True)])
+    n = 9
+    print("We can also find the permutation at any index directly")
+    print(unrank(3, 4))
+    print("And go back from the permutation to its index")
+    print(rank((2, 0, 1)))
+    print("Which lets us walk through any range of permutations")
+    print(list(permutations_range(3, 2, 5)))
+    print(f"Let's compare how long it takes to go through all the "
+          f"permutations for n = {n}")
+    start_time = time()
+    rp.generate_recursive_permutations(n)
+    execution_time = time() - start_time
+    print(f"Recursive list: {execution_time} seconds.")
+    start_time = time()
+    generate_itertools_permutations(n)
+    execution_time = time() - start_time
+    print(f"itertools list: {execution_time} seconds.")
+    start_time = time()
+    for _ in rp.iterate_heap_permutations(n):
+        pass
+    execution_time = time() - start_time
+    print(f"Heap's algorithm in place: {execution_time} seconds.")
+    start_time = time()
+    for _ in rp.iterate_heap_permutations(n, copy=True):
+        pass
+    execution_time = time() - start_time
+    print(f"Heap's algorithm with tuples: {execution_time} seconds.")
+    if np is not None:
+        start_time = time()
+        for _ in generate_numpy_permutation_batches(n):
+            pass
+        execution_time = time() - start_time
+        print(f"NumPy batches: {execution_time} seconds.")
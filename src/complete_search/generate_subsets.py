@@ -13,6 +13,9 @@ recursion, or use the bitwise representation.
 Consider that these will generate all subsets for all natural numbers
 including zero of size n.
 """
+from math import comb
+from typing import Iterator
+
 
 class RecursiveSearch():
     subset: set
@@ -77,6 +80,90 @@ def generate_bitwise_search(n: int) -> list[set]:
     return subsets
 
 
+def iterate_bitwise_masks(n: int) -> Iterator[int]:
+    """Yield every subset as an integer mask, where bit i means i is in it.
+
+    Nothing is allocated per subset besides the integer itself.
+    """
+    yield from range(1 << n)
+
+
+def iterate_gray_code_deltas(n: int) -> Iterator[tuple[int, bool]]:
+    """Walk all subsets in Gray code order, yielding only what changes.
+
+    The walk starts from the empty subset, which is not yielded, and each of
+    the following 2^n - 1 steps adds or removes exactly one element. Every
+    step yields that element and whether it was added, so running sums or
+    counts over the subset can be updated in O(1) per subset.
+    """
+    gray = 0
+    for k in range(1, 1 << n):
+        # The element that changes in step k is the lowest set bit of k
+        bit = k & -k
+        gray ^= bit
+        yield bit.bit_length() - 1, bool(gray & bit)
+
+
+def rank_k_subset(mask: int) -> int:
+    """Return the index of a subset among those of its size, in mask order.
+
+    Uses the combinatorial number system: if the elements of the subset are
+    ``c_1 < c_2 < ... < c_k``, the index is ``C(c_1, 1) + ... + C(c_k, k)``.
+    """
+    index = 0
+    i = 0
+    while mask:
+        bit = mask & -mask
+        mask ^= bit
+        i += 1
+        index += comb(bit.bit_length() - 1, i)
+    return index
+
+
+def unrank_k_subset(n: int, k: int, index: int) -> int:
+    """Return the mask of the k-subset of n elements at a given index.
+
+    This is the inverse of ``rank_k_subset``: the largest element is the
+    largest c with ``C(c, k) <= index``, and so on for the smaller ones.
+    """
+    if not 0 <= index < comb(n, k):
+        raise ValueError(f"Index {index} out of range for C({n}, {k})")
+    mask = 0
+    c = n
+    for i in range(k, 0, -1):
+        c -= 1
+        while comb(c, i) > index:
+            c -= 1
+        index -= comb(c, i)
+        mask |= 1 << c
+    return mask
+
+
+def iterate_k_subset_masks(
+        n: int, k: int, start: int = 0,
+        stop: int | None = None) -> Iterator[int]:
+    """Yield the masks of the subsets of size k, in increasing order.
+
+    Starts at index ``start`` and ends before index ``stop``, so the C(n, k)
+    subsets can be split in contiguous chunks. The next mask with the same
+    number of bits is found with Gosper's hack: add the lowest set bit to
+    carry the lowest block of ones one position up, then put back the
+    remaining ones of the block at the bottom.
+    """
+    total = comb(n, k)
+    if stop is None or stop > total:
+        stop = total
+    if start >= stop:
+        return
+    mask = unrank_k_subset(n, k, start)
+    yield mask
+    for _ in range(stop - start - 1):
+        lowest = mask & -mask
+        ripple = mask + lowest
+        mask = (((ripple ^ mask) >> 2) // lowest) | ripple
+        yield mask
+
+
 if __name__ == "__main__":
     rs = RecursiveSearch()
     print("First, print all generated subsets in the function")
@@ -87,3 +174,19 @@ if __name__ == "__main__":
     print_bitwise_search(3)
     print("And we can get a useful list too")
     print(generate_bitwise_search(3))
+    print("Or just walk the bits without building any subset")
+    print([bin(mask) for mask in iterate_bitwise_masks(3)])
+    items = [3, 5, 7]
+    print(f"With a Gray code, only one element changes per step. This lets us "
+          f"keep the sum of each subset of {items} up to date:")
+    total = 0
+    print(total)
+    for i, added in iterate_gray_code_deltas(len(items)):
+        total += items[i] if added else -items[i]
+        print(total)
+    print("If we only need subsets of a given size, we can skip the others")
+    print([bin(mask) for mask in iterate_k_subset_masks(4, 2)])
+    print("And we can start anywhere, since we can find the subset at any "
+          "index, and the index of any subset")
+    print([bin(mask) for mask in iterate_k_subset_masks(4, 2, 3)])
+    print(rank_k_subset(0b1010))
@@ -4,22 +4,61 @@
 # 
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree. 
+import heapq
+from bisect import bisect_left, bisect_right
+import tracemalloc
+from functools import lru_cache
+from itertools import islice
+from random import randint, seed
 from time import time
+from typing import Iterator
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def generate_subsets(items: list[int]) -> list[set]:
+
+def generate_subsets(items: list[int]) -> list[list[int]]:
+    # Lists instead of sets, otherwise equal items collapse into one
     b = 0
     subsets = []
     while b < (1 << len(items)):
-        subset = set()
+        subset = []
         for i in range(0, len(items)):
             if b & 1 << i:
-                subset.add(items[i])
+                subset.append(items[i])
         b += 1
         subsets.append(subset)
     return subsets
 
 
+def generate_sorted_subset_sums(
+        items: list[int], use_numpy: bool = False) -> "list[int] | np.ndarray":
+    """Return the sums of all subsets of items, sorted, duplicates included.
+
+    Starting from the sums of no items, ``[0]``, each new item doubles the
+    list: the current sums are still valid, and so are the current sums plus
+    the item. Both halves are already sorted, so merging them is linear, and
+    the whole list takes O(2^n) instead of O(n 2^n) to build. Equal items
+    are kept apart, since each subset is built from positions, not values.
+
+    With ``use_numpy``, the sums are kept in a NumPy ``int64`` array.
+    """
+    if use_numpy:
+        if np is None:
+            raise ImportError("NumPy is required for use_numpy=True")
+        sums = np.zeros(1, dtype=np.int64)
+        for item in items:
+            sums = np.sort(np.concatenate((sums, sums + item)), kind="stable")
+        return sums
+    sums = [0]
+    for item in items:
+        # Timsort finds the two sorted runs and only merges them
+        sums = sorted(sums + [total + item for total in sums])
+    return sums
+
+
 def check_target_sum_unoptimized(items: list[int], n: int) -> bool:
     subsets = generate_subsets(items)
     for subset in subsets:
@@ -28,23 +67,203 @@ def check_target_sum_unoptimized(items: list[int], n: int) -> bool:
     return False
 
 
+def _generate_subset_sums_with_masks(
+        items: list[int]) -> list[tuple[int, int]]:
+    """Return the sum of every subset of items with its mask, sorted by sum.
+
+    Bit i of a mask means ``items[i]`` is in the subset. The list is built
+    by merge doubling, as in ``generate_sorted_subset_sums``.
+    """
+    sums = [(0, 0)]
+    for i, item in enumerate(items):
+        bit = 1 << i
+        sums = sorted(
+            sums + [(total + item, mask | bit) for total, mask in sums])
+    return sums
+
+
+def _witness(items: list[int], mask: int) -> list[int]:
+    return [item for i, item in enumerate(items) if mask & 1 << i]
+
+
+class SubsetSumIndex:
+    """Sorted subset sums of both halves of a list, to answer many queries.
+
+    Building the index takes O(2^(n/2)) time and memory, once. Afterwards,
+    every query sweeps both sorted lists, which is also O(2^(n/2)).
+    """
+    first_items: list[int]
+    second_items: list[int]
+    first_sums: list[int]
+    first_masks: list[int]
+    second_sums: list[int]
+    second_masks: list[int]
+
+    def __init__(self, items: list[int]) -> None:
+        self.first_items = items[:len(items)//2]
+        self.second_items = items[len(items)//2:]
+        first_list = _generate_subset_sums_with_masks(self.first_items)
+        second_list = _generate_subset_sums_with_masks(self.second_items)
+        self.first_sums = [total for total, _ in first_list]
+        self.first_masks = [mask for _, mask in first_list]
+        self.second_sums = [total for total, _ in second_list]
+        self.second_masks = [mask for _, mask in second_list]
+
+    def find(self, n: int) -> list[int] | None:
+        """Return items adding up to n, or None if there are none.
+
+        One pointer goes up the first list and another one goes down the
+        second, moving whichever pointer brings the pair closer to n.
+        """
+        first_sums = self.first_sums
+        second_sums = self.second_sums
+        i = 0
+        j = len(second_sums) - 1
+        while i < len(first_sums) and j >= 0:
+            total = first_sums[i] + second_sums[j]
+            if total == n:
+                return (_witness(self.first_items, self.first_masks[i])
+                        + _witness(self.second_items, self.second_masks[j]))
+            if total < n:
+                i += 1
+            else:
+                j -= 1
+        return None
+
+    def contains(self, n: int) -> bool:
+        return self.find(n) is not None
+
+    def contains_many(self, targets: list[int]) -> list[bool]:
+        """Check several targets, building a set of the second list once.
+
+        For every target, the sums ``a`` of the first list that can reach
+        it, between ``target - max(second)`` and ``target - min(second)``,
+        are found with a binary search, and ``target - a`` is looked up in
+        the set. That is O(2^(n/2)) for the set plus O(2^(n/2)) per target
+        in the worst case, the same bound as calling ``contains`` for each
+        of them, but every step is a hash lookup, and a target stops at its
+        first match.
+        """
+        first_sums = self.first_sums
+        second_set = set(self.second_sums)
+        lowest = self.second_sums[0]
+        highest = self.second_sums[-1]
+        answers = []
+        for target in targets:
+            start = bisect_left(first_sums, target - highest)
+            stop = bisect_right(first_sums, target - lowest)
+            answers.append(any(
+                target - a in second_set
+                for a in islice(first_sums, start, stop)))
+        return answers
+
+    def closest_at_most(self, n: int) -> int | None:
+        """Return the largest subset sum not above n, or None if none is."""
+        best = None
+        j = len(self.second_sums) - 1
+        for a in self.first_sums:
+            while j >= 0 and a + self.second_sums[j] > n:
+                j -= 1
+            if j < 0:
+                break
+            if best is None or a + self.second_sums[j] > best:
+                best = a + self.second_sums[j]
+        return best
+
+
+@lru_cache(maxsize=16)
+def _cached_subset_sum_index(items: tuple[int, ...]) -> SubsetSumIndex:
+    return SubsetSumIndex(list(items))
+
+
+def get_subset_sum_index(items: list[int]) -> SubsetSumIndex:
+    """Return the index of a list, reusing one of the last ones built."""
+    return _cached_subset_sum_index(tuple(items))
+
+
+def find_target_sum_meet_in_middle(
+        items: list[int], n: int) -> list[int] | None:
+    """Return items adding up to n, or None if there are none.
+
+    The sums of all subsets of each half of the list are sorted, and then
+    joined in a single sweep, which takes O(2^(n/2)) steps instead of
+    O(2^n).
+    """
+    return SubsetSumIndex(items).find(n)
+
+
 def check_target_sum_meet_in_middle(items: list[int], n: int) -> bool:
-    first_subsets = generate_subsets(items[:len(items)//2])
-    first_list = sorted([
-        sum(subset)
-        for subset in first_subsets
-    ])
-
-    second_subsets = generate_subsets(items[len(items)//2:])
-    second_list = sorted([
-        sum(subset)
-        for subset in second_subsets
-    ])
-    for i in first_list:
-        for j in second_list:
-            if i + j == n:
-                return True
-    return False
+    return find_target_sum_meet_in_middle(items, n) is not None
+
+
+def _stream_pair_sums(
+        first: list[tuple[int, int]], second: list[tuple[int, int]],
+        descending: bool = False) -> Iterator[tuple[int, int, int]]:
+    """Yield every sum of a pair from two sorted lists, in order.
+
+    The lists hold (sum, mask) pairs. Every item of ``first`` is paired with
+    its position in ``second`` in a heap, so only one pair per item of
+    ``first`` is kept in memory at a time. Yields the sum with both masks.
+    """
+    if not first or not second:
+        return
+    sign = -1 if descending else 1
+    start = len(second) - 1 if descending else 0
+    step = sign
+    heap = [
+        (sign * (total + second[start][0]), i, start)
+        for i, (total, _) in enumerate(first)
+    ]
+    heapq.heapify(heap)
+    while heap:
+        key, i, j = heap[0]
+        yield sign * key, first[i][1], second[j][1]
+        j += step
+        if 0 <= j < len(second):
+            heapq.heapreplace(
+                heap, (sign * (first[i][0] + second[j][0]), i, j))
+        else:
+            heapq.heappop(heap)
+
+
+def find_target_sum_schroeppel_shamir(
+        items: list[int], n: int) -> list[int] | None:
+    """Return items adding up to n, or None if there are none.
+
+    Meet in the middle needs the sorted sums of both halves in memory. Here,
+    the list is split in four quarters instead, and the sums of each half
+    are streamed in order from the sorted sums of its two quarters. The
+    same two pointer sweep runs over both streams, so the time is still
+    O(2^(n/2)), up to a log factor, but memory is only O(2^(n/4)).
+    """
+    half = len(items) // 2
+    quarters = [
+        items[:half//2], items[half//2:half],
+        items[half:half + (len(items) - half)//2],
+        items[half + (len(items) - half)//2:],
+    ]
+    sums = [_generate_subset_sums_with_masks(quarter) for quarter in quarters]
+    ascending = _stream_pair_sums(sums[0], sums[1])
+    descending = _stream_pair_sums(sums[2], sums[3], descending=True)
+    left = next(ascending, None)
+    right = next(descending, None)
+    while left is not None and right is not None:
+        total = left[0] + right[0]
+        if total == n:
+            return (_witness(quarters[0], left[1])
+                    + _witness(quarters[1], left[2])
+                    + _witness(quarters[2], right[1])
+                    + _witness(quarters[3], right[2]))
+        if total < n:
+            left = next(ascending, None)
+        else:
+            right = next(descending, None)
+    return None
+
+
+def check_target_sum_schroeppel_shamir(items: list[int], n: int) -> bool:
+    return find_target_sum_schroeppel_shamir(items, n) is not None
+
 
 if __name__ == "__main__":
     input_list = [2, 4, 5, 9]
@@ -63,3 +282,45 @@ if __name__ == "__main__":
     print(check_target_sum_meet_in_middle(input_list, target_number))
     execution_time = time() - start_time
     print(f"That took {execution_time} seconds.")
+    print(f"This is one way to get {target_number}:")
+    print(find_target_sum_meet_in_middle(input_list, target_number))
+    print("These are all the sums we can build, in order:")
+    print(generate_sorted_subset_sums(input_list))
+    print("If we have many targets for the same list, we can build the sorted "
+          "halves just once and ask everything we need")
+    index = get_subset_sum_index(input_list)
+    print(index.contains_many([1, 3, 10, 15, 21]))
+    print("Including the closest sum that doesn't go over a target")
+    print(index.closest_at_most(10))
+    print("Let's see how both scale with random lists that can't reach the "
+          "target, since that's the worst case.")
+    seed(0)
+    for size in range(8, 41, 4):
+        input_list = [randint(1, 10**9) * 2 for _ in range(size)]
+        target_number = 1
+        if size <= 16:
+            start_time = time()
+            check_target_sum_unoptimized(input_list, target_number)
+            execution_time = time() - start_time
+            print(f"n = {size}, unoptimized: {execution_time} seconds.")
+        start_time = time()
+        check_target_sum_meet_in_middle(input_list, target_number)
+        execution_time = time() - start_time
+        print(f"n = {size}, meet in the middle: {execution_time} seconds.")
+    print("Meet in the middle keeps all the sums of both halves in memory. "
+          "Splitting the list in four quarters and streaming the sums of "
+          "each half needs much less. Let's compare peak memory.")
+    for size in range(16, 33, 8):
+        input_list = [randint(1, 10**9) * 2 for _ in range(size)]
+        target_number = 1
+        for check in (
+                check_target_sum_meet_in_middle,
+                check_target_sum_schroeppel_shamir):
+            tracemalloc.start()
+            start_time = time()
+            check(input_list, target_number)
+            execution_time = time() - start_time
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"n = {size}, {check.__name__}: {peak} bytes, "
+                  f"{execution_time} seconds.")
@@ -4,13 +4,228 @@
 # 
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
-from time import time
- 
+import os
+from multiprocessing import JoinableQueue, Process, Queue
+from time import perf_counter, time
+from typing import Callable
+
+
+def _count_maze_paths(
+        moves: list[tuple[tuple[int, int, int, int], ...]],
+        next_to_last: list[int], neighbors: list[int], stop_tiles: int,
+        stack: list[tuple[int, int, int]], tasks: "JoinableQueue | None" = None,
+        share_every: int = 10000,
+        frontier: list[tuple[int, int, int]] | None = None) -> int:
+    """Count the paths of the partial paths in the stack.
+
+    This is the search of ``SolveMaze.generate_bitboard``, on an explicit
+    stack of partial paths (current tile, visited mask and number of visited
+    tiles). A partial path with ``stop_tiles`` visited tiles is not expanded:
+    it is added to ``frontier`` if given, or else counted, when only the
+    final tile is left. With a task queue, every ``share_every`` visited
+    nodes, if the queue is empty, some other worker is probably idle, so the
+    shallowest half of the stack, which are the biggest subtrees, goes back
+    to the queue.
+    """
+    count = 0
+    nodes = 0
+    while stack:
+        cell, visited, visited_tiles = stack.pop()
+        if visited_tiles == stop_tiles:
+            if frontier is None:
+                count += next_to_last[cell]
+            else:
+                frontier.append((cell, visited, visited_tiles))
+            continue
+        # A free neighbor with less than two free neighbors of its own must
+        # be the next move, and if two of them need it, the path is stuck
+        forced = 0
+        for target, bit, _, _ in moves[cell]:
+            if (not visited & bit
+                    and (neighbors[target] & ~visited).bit_count() < 2):
+                if forced:
+                    forced = -1
+                    break
+                forced = bit
+        if forced < 0:
+            continue
+        for target, bit, ahead, sides in moves[cell]:
+            if (visited & bit or (forced and bit != forced)
+                    or (visited & ahead and not visited & sides)):
+                continue
+            stack.append((target, visited | bit, visited_tiles + 1))
+        if tasks is not None:
+            nodes += 1
+            if nodes % share_every == 0 and len(stack) > 1 and tasks.empty():
+                shared = len(stack) // 2
+                for partial_path in stack[:shared]:
+                    tasks.put(partial_path)
+                del stack[:shared]
+    return count
+
+
+def _solve_maze_worker(
+        moves: list[tuple[tuple[int, int, int, int], ...]],
+        next_to_last: list[int], neighbors: list[int], last: int,
+        tasks: JoinableQueue, results: Queue, share_every: int) -> None:
+    """Count the paths of the partial paths taken from the task queue."""
+    count = 0
+    while True:
+        task = tasks.get()
+        if task is None:
+            tasks.task_done()
+            break
+        count += _count_maze_paths(
+            moves, next_to_last, neighbors, last, [task], tasks, share_every)
+        tasks.task_done()
+    results.put(count)
+
+
+class MazeSearchStats:
+    """What happened during the last search with pruning rules."""
+    nodes: int
+    prunes: dict[str, int]
+    seconds: dict[str, float]
+
+    def __init__(self, rules: list[str]) -> None:
+        self.nodes = 0
+        self.prunes = {rule: 0 for rule in rules}
+        self.seconds = {rule: 0.0 for rule in rules}
+
+    def __str__(self) -> str:
+        lines = [f"nodes={self.nodes}"]
+        for rule in self.prunes:
+            lines.append(f"{rule}: prunes={self.prunes[rule]}, "
+                         f"seconds={self.seconds[rule]}")
+        return "\n".join(lines)
+
+
+def _is_free(maze: "SolveMaze", x: int, y: int) -> bool:
+    return 0 <= x < maze.n and 0 <= y < maze.n and not maze.maze[y][x]
+
+
+def _prune_symmetry(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    # Only generate down solution, every path has a mirror image going right
+    return x == 0 and y == 0 and tx != 0
+
+
+def _prune_early_arrival(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    return (tx == maze.n - 1 and ty == maze.n - 1
+            and visited_tiles + 1 < maze.n * maze.n)
+
+
+def _splits_maze(
+        maze: "SolveMaze", tx: int, ty: int, dx: int, dy: int) -> bool:
+    """Whether both tiles beside the target tile, across the move, are free."""
+    return _is_free(maze, tx + dy, ty + dx) and _is_free(maze, tx - dy, ty - dx)
+
+
+def _prune_wall_split(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    dx = tx - x
+    dy = ty - y
+    ahead_x = tx + dx
+    ahead_y = ty + dy
+    return (not (0 <= ahead_x < maze.n and 0 <= ahead_y < maze.n)
+            and _splits_maze(maze, tx, ty, dx, dy))
+
+
+def _prune_forward_blocked(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    dx = tx - x
+    dy = ty - y
+    return (not _is_free(maze, tx + dx, ty + dy)
+            and _splits_maze(maze, tx, ty, dx, dy))
+
+
+def _prune_dead_end(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    """Whether leaving the current tile strands one of its free neighbors.
+
+    Every free tile needs two free neighbors to be crossed later, counting
+    the target tile, which will be the end of the path, or one for the
+    final tile. Only the neighbors of the current tile lose a neighbor with
+    this move, so only those are checked.
+    """
+    target_bit = 1 << (ty * maze.n + tx)
+    free = ((1 << (maze.n * maze.n)) - 1) & ~maze.visited_mask & ~target_bit
+    last = maze.n * maze.n - 1
+    candidates = maze.neighbors[y * maze.n + x] & free
+    while candidates:
+        bit = candidates & -candidates
+        candidates ^= bit
+        tile = bit.bit_length() - 1
+        exits = (maze.neighbors[tile] & (free | target_bit)).bit_count()
+        if exits < (1 if tile == last else 2):
+            return True
+    return False
+
+
+def _prune_connectivity(
+        maze: "SolveMaze", x: int, y: int, tx: int, ty: int,
+        visited_tiles: int) -> bool:
+    """Whether some free tiles can't be reached from the target tile anymore.
+
+    If free tiles remain but none is next to the target tile, the path is
+    stuck. Otherwise, the move can only cut free tiles off if they touch the
+    tile being left, or if the target tile has two or more free neighbors
+    that may lie on different sides of the path. Only then is the flood fill
+    run, growing the reached tiles in all four directions at once with
+    shifts of the free tiles mask.
+    """
+    target = ty * maze.n + tx
+    target_bit = 1 << target
+    full = (1 << (maze.n * maze.n)) - 1
+    free = full & ~maze.visited_mask & ~target_bit
+    target_free = maze.neighbors[target] & free
+    if not target_free:
+        return free != 0
+    if (not maze.neighbors[y * maze.n + x] & free
+            and target_free.bit_count() < 2):
+        return False
+    left_column = sum(1 << (row * maze.n) for row in range(maze.n))
+    right_column = left_column << (maze.n - 1)
+    reached = target_free
+    while True:
+        grown = reached | (free & (
+            ((reached << 1) & ~left_column)
+            | ((reached >> 1) & ~right_column)
+            | (reached << maze.n)
+            | (reached >> maze.n)
+        ))
+        if grown == reached:
+            return reached != free
+        reached = grown
+
+
+# Each rule receives the maze, the current tile, the target tile of a move and
+# the number of visited tiles, and returns whether the move must be pruned
+PRUNING_RULES: dict[
+        str, Callable[["SolveMaze", int, int, int, int, int], bool]] = {
+    "symmetry": _prune_symmetry,
+    "early_arrival": _prune_early_arrival,
+    "wall_split": _prune_wall_split,
+    "forward_blocked": _prune_forward_blocked,
+    "dead_end": _prune_dead_end,
+    "connectivity": _prune_connectivity,
+}
+
 
 class SolveMaze:
     maze: list
     n: int
     amount_of_paths: int
+    moves: list[list[tuple[int, int, int, int]]]
+    neighbors: list[int]
+    visited_mask: int
+    stats: MazeSearchStats
 
     def _reset(self):
         self.maze = [
@@ -19,10 +234,50 @@ class SolveMaze:
             ] for _ in range(self.n)
         ]
         self.amount_of_paths = 0
+        self.visited_mask = 0
 
     def __init__(self, n: int):
         self.n = n
         self._reset()
+        self._build_moves()
+
+    def _build_moves(self) -> None:
+        """Precompute the moves out of every tile for the bitboard engine.
+
+        Tile ``(x, y)`` is bit ``y * n + x``. Each move is a tuple with the
+        index of the target tile, its bit, the bit of the tile after it in
+        the same direction and the bits of the two tiles beside it. The
+        first tile is always visited, so its bit stands for a wall ahead,
+        and for the sides when one of them is a wall, since then the move
+        can't split the maze. This way, a move splits the maze exactly when
+        ``visited & ahead and not visited & sides``.
+        """
+        self.moves = []
+        for y in range(self.n):
+            for x in range(self.n):
+                cell_moves = []
+                for dx, dy in ((0, -1), (0, 1), (-1, 0), (1, 0)):
+                    tx = x + dx
+                    ty = y + dy
+                    if not (0 <= tx < self.n and 0 <= ty < self.n):
+                        continue
+                    ahead = 1
+                    if 0 <= tx + dx < self.n and 0 <= ty + dy < self.n:
+                        ahead = 1 << ((ty + dy) * self.n + tx + dx)
+                    sides = 1
+                    side_tiles = [(tx + dy, ty + dx), (tx - dy, ty - dx)]
+                    if all(0 <= sx < self.n and 0 <= sy < self.n
+                           for sx, sy in side_tiles):
+                        sides = 0
+                        for sx, sy in side_tiles:
+                            sides |= 1 << (sy * self.n + sx)
+                    target = ty * self.n + tx
+                    cell_moves.append((target, 1 << target, ahead, sides))
+                self.moves.append(cell_moves)
+        self.neighbors = [
+            sum(bit for _, bit, _, _ in cell_moves)
+            for cell_moves in self.moves
+        ]
     
     def _print_maze(self):
         print("MAZE")
@@ -188,6 +443,239 @@ class SolveMaze:
         self._generate_opt_4()
         return self.amount_of_paths * 2
 
+    def _generate_with_rules(
+            self, rules: list[tuple[str, Callable]], x: int = 0, y: int = 0,
+            visited_tiles: int = 1) -> None:
+        self.stats.nodes += 1
+        self.maze[y][x] = True
+        self.visited_mask |= 1 << (y * self.n + x)
+        if visited_tiles == self.n * self.n:
+            if x == self.n - 1 and y == self.n - 1:
+                self.amount_of_paths += 1
+            self.maze[y][x] = False
+            self.visited_mask ^= 1 << (y * self.n + x)
+            return
+
+        for tx, ty in ((x, y-1), (x, y+1), (x-1, y), (x+1, y)):
+            if not _is_free(self, tx, ty):
+                continue
+            pruned = False
+            for name, rule in rules:
+                start_time = perf_counter()
+                pruned = rule(self, x, y, tx, ty, visited_tiles)
+                self.stats.seconds[name] += perf_counter() - start_time
+                if pruned:
+                    self.stats.prunes[name] += 1
+                    break
+            if not pruned:
+                self._generate_with_rules(rules, tx, ty, visited_tiles+1)
+
+        self.maze[y][x] = False
+        self.visited_mask ^= 1 << (y * self.n + x)
+
+    def generate_with_rules(
+            self, rules: list[str], check_parity: bool = False) -> int:
+        """Search with a chosen list of pruning rules from ``PRUNING_RULES``.
+
+        Rules are checked in order for every move, and the first one that
+        prunes the move is the one credited for it. After the search,
+        ``stats`` holds the number of nodes visited, and the number of
+        prunes and the time spent in each rule. For example,
+        ``["symmetry", "early_arrival", "forward_blocked"]`` is the same
+        search as ``generate_opt_4``.
+
+        With ``check_parity``, the checkerboard colors are checked once
+        before searching. A path alternates colors, and the first and final
+        tiles have the same color, so it must cross an odd number of tiles.
+        When n is even there is no path at all, and no node is visited.
+        """
+        self._reset()
+        self.stats = MazeSearchStats(rules)
+        if check_parity and self.n * self.n % 2 == 0:
+            return 0
+        self._generate_with_rules(
+            [(rule, PRUNING_RULES[rule]) for rule in rules])
+        if "symmetry" in rules:
+            return self.amount_of_paths * 2
+        return self.amount_of_paths
+
+    def _bitboard_tables(
+            self) -> tuple[list[tuple[tuple[int, int, int, int], ...]],
+                           list[int]]:
+        """Return the moves out of every tile but into the final one, and
+        whether each tile is next to the final one, as 1 or 0.
+
+        The final tile can only be entered as the very last move, so it is
+        handled apart, and the search never has to check for it.
+        """
+        last = self.n * self.n - 1
+        moves = [
+            tuple(move for move in cell_moves if move[0] != last)
+            for cell_moves in self.moves
+        ]
+        next_to_last = [
+            int(any(move[0] == last for move in cell_moves))
+            for cell_moves in self.moves
+        ]
+        return moves, next_to_last
+
+    def generate_bitboard(self) -> int:
+        """Search on a bitmask, with the pruning of ``generate_opt_4``.
+
+        The visited tiles are the bits of a single integer, and the moves out
+        of every tile are precomputed, so checking a move takes a few bitwise
+        operations instead of many lookups in the maze. With a mask, it is
+        also cheap to look at the free neighbors of the current tile: one
+        with less than two free neighbors of its own must be the next move,
+        since once we leave, there is no way in and out of it anymore. If
+        two of them need it, the path is stuck.
+        """
+        self._reset()
+        if self.n == 1:
+            self.amount_of_paths = 1
+            return self.amount_of_paths * 2
+        moves, next_to_last = self._bitboard_tables()
+        # Only generate down solution
+        self.amount_of_paths = _count_maze_paths(
+            moves, next_to_last, self.neighbors, self.n * self.n - 1,
+            [(self.n, 1 | 1 << self.n, 2)])
+        return self.amount_of_paths * 2
+
+    def generate_parallel(
+            self, workers: int | None = None, split_depth: int = 8,
+            share_every: int = 10000) -> int:
+        """Run the bitboard search on several processes.
+
+        The search is first run ``split_depth`` moves from the start,
+        and each partial path (current tile and visited mask) becomes a task
+        in a queue shared by ``workers`` processes, one per CPU by default.
+        Workers that run out of tasks are fed by the busy ones, which put
+        half of their pending subtrees back in the queue every
+        ``share_every`` nodes if it is empty.
+        """
+        self._reset()
+        if self.n == 1:
+            self.amount_of_paths = 1
+            return self.amount_of_paths * 2
+        moves, next_to_last = self._bitboard_tables()
+        last = self.n * self.n - 1
+        # Only generate down solution, up to split_depth more visited tiles
+        partial_paths = []
+        _count_maze_paths(
+            moves, next_to_last, self.neighbors, min(2 + split_depth, last),
+            [(self.n, 1 | 1 << self.n, 2)], frontier=partial_paths)
+        tasks = JoinableQueue()
+        results = Queue()
+        for partial_path in partial_paths:
+            tasks.put(partial_path)
+        processes = [
+            Process(
+                target=_solve_maze_worker,
+                args=(moves, next_to_last, self.neighbors, last, tasks,
+                      results, share_every))
+            for _ in range(workers or os.cpu_count())
+        ]
+        for process in processes:
+            process.start()
+        tasks.join()
+        for _ in processes:
+            tasks.put(None)
+        self.amount_of_paths = sum(results.get() for _ in processes)
+        for process in processes:
+            process.join()
+        return self.amount_of_paths * 2
+
+    @staticmethod
+    def _normalize_plugs(plugs: list[int]) -> tuple[int, ...]:
+        """Relabel segments by order of appearance so equal states match."""
+        labels = {0: 0}
+        for plug in plugs:
+            if plug not in labels:
+                labels[plug] = len(labels)
+        return tuple(labels[plug] for plug in plugs)
+
+    def generate_frontier_dp(self) -> int:
+        """Count the paths tile by tile, keeping only the frontier.
+
+        Tiles are processed in reading order. The state is what crosses the
+        boundary between processed and unprocessed tiles: for every column,
+        whether the path goes down into it, and for the current tile, whether
+        the path comes in from the left. Every crossing is labelled with the
+        path segment it belongs to, so that joining two ends of the same
+        segment, which would close a loop, can be rejected. A segment whose
+        label appears only once is the one attached to the first tile.
+
+        For the current tile, ``plugs[x]`` is the crossing from the left and
+        ``plugs[x+1]`` the one from above. Every tile but the first and the
+        last must have exactly two crossings, which is what makes the path
+        visit all of them. States are merged in a dictionary, so the time
+        depends on the number of different frontiers instead of the number
+        of paths.
+        """
+        self._reset()
+        if self.n == 1:
+            self.amount_of_paths = 1
+            return self.amount_of_paths
+        last = self.n - 1
+        states = {tuple([0] * (self.n + 1)): 1}
+        for y in range(self.n):
+            for x in range(self.n):
+                new_states = {}
+
+                def add(plugs: list[int], ways: int) -> None:
+                    state = self._normalize_plugs(plugs)
+                    new_states[state] = new_states.get(state, 0) + ways
+
+                for state, ways in states.items():
+                    left = state[x]
+                    up = state[x + 1]
+                    plugs = list(state)
+                    if x == 0 and y == 0:
+                        # The first tile only has one crossing
+                        plugs[x + 1] = self.n + 1
+                        add(plugs, ways)
+                        plugs[x + 1] = 0
+                        plugs[x] = self.n + 1
+                        add(plugs, ways)
+                    elif x == last and y == last:
+                        # The last tile has one crossing, coming from the
+                        # segment attached to the first tile, and nothing
+                        # else can be left open
+                        end = left or up
+                        if ((left == 0) != (up == 0)
+                                and state.count(end) == 1
+                                and sum(1 for plug in state if plug) == 1):
+                            self.amount_of_paths += ways
+                    elif left == 0 and up == 0:
+                        # Start a new segment going right and down
+                        if x < last and y < last:
+                            plugs[x] = plugs[x + 1] = self.n + 2
+                            add(plugs, ways)
+                    elif left == 0 or up == 0:
+                        # Continue the segment going right or down
+                        segment = left or up
+                        if x < last:
+                            plugs[x] = 0
+                            plugs[x + 1] = segment
+                            add(plugs, ways)
+                        if y < last:
+                            plugs[x] = segment
+                            plugs[x + 1] = 0
+                            add(plugs, ways)
+                    elif left != up:
+                        # Join two segments, never both ends of one
+                        plugs[x] = plugs[x + 1] = 0
+                        add([left if plug == up else plug for plug in plugs],
+                            ways)
+                states = new_states
+            # Move to the next row, the crossing from the left is empty again
+            states = {
+                (0,) + state[:self.n]: ways
+                for state, ways in states.items()
+                if state[self.n] == 0
+            }
+        return self.amount_of_paths
+
 
 if __name__ == "__main__":
     maze_size = 6
@@ -221,7 +709,65 @@ if __name__ == "__main__":
           "forward instead of just a wall?")
     start_time = time()
     print(sm.generate_opt_4())
+    opt_4_time = time() - start_time
+    print(f"That took {opt_4_time} seconds to execute. We can do the same "
+          "pruning with all visited tiles stored as bits in a single number, "
+          "which also makes it cheap to spot tiles that must be visited next.")
+    start_time = time()
+    print(sm.generate_bitboard())
+    execution_time = time() - start_time
+    print(f"That took {execution_time} seconds to execute, a "
+          f"{opt_4_time / execution_time}x speedup.")
+    print("We can also pick which pruning rules to use, and see how much "
+          "each one of them prunes and costs:")
+    for rules in (
+            ["symmetry", "early_arrival"],
+            ["symmetry", "early_arrival", "wall_split"],
+            ["symmetry", "early_arrival", "forward_blocked"]):
+        print(sm.generate_with_rules(rules))
+        print(sm.stats)
+    print("A path alternates checkerboard colors and starts and ends on the "
+          "same one, so it crosses an odd number of tiles. Checking that "
+          "once, before searching, solves even mazes without visiting a "
+          "single node:")
+    print(sm.generate_with_rules(
+        ["symmetry", "early_arrival", "forward_blocked"], check_parity=True))
+    print(sm.stats)
+    maze_size = 5
+    print("Some dead branches are still explored. Let's also prune moves "
+          "that leave a tile with a single way in, or split the free tiles "
+          f"in two. These are the nodes visited in a {maze_size}x{maze_size} "
+          "maze:")
+    sm = SolveMaze(maze_size)
+    for rules in (
+            ["symmetry", "early_arrival", "forward_blocked"],
+            ["symmetry", "early_arrival", "forward_blocked", "dead_end"],
+            ["symmetry", "early_arrival", "forward_blocked", "dead_end",
+             "connectivity"]):
+        print(sm.generate_with_rules(rules))
+        print(sm.stats)
+    maze_size = 9
+    print("Backtracking will never scale much further. Counting with a "
+          "dynamic program over the frontier of the processed tiles lets us "
+          f"solve a {maze_size}x{maze_size} maze:")
+    start_time = time()
+    print(SolveMaze(maze_size).generate_frontier_dp())
     execution_time = time() - start_time
     print(f"That took {execution_time} seconds to execute.")
+    maze_size = 7
+    print(f"Going back to backtracking, a {maze_size}x{maze_size} maze can "
+          "be split among several processes. Let's compare with the best "
+          "single process search.")
+    sm = SolveMaze(maze_size)
+    start_time = time()
+    print(sm.generate_opt_4())
+    single_time = time() - start_time
+    print(f"That took {single_time} seconds to execute.")
+    for workers in range(1, os.cpu_count() + 1):
+        start_time = time()
+        print(sm.generate_parallel(workers))
+        execution_time = time() - start_time
+        print(f"With {workers} workers, that took {execution_time} seconds "
+              f"to execute, a {single_time / execution_time}x speedup.")
     print("Generally speaking, the more pruning we do, the faster runtimes "
           "we get.")
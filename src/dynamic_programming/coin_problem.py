@@ -8,36 +8,249 @@
 
 Dynamic programming version.
 """
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _multiply_modulo_recurrence(
+        a: list[int], b: list[int], coefficients: list[int],
+        modulo: int) -> list[int]:
+    """Multiply two polynomials modulo the characteristic polynomial.
+
+    The characteristic polynomial of ``f(x) = c_1 f(x-1) + ... + c_k f(x-k)``
+    is ``x^k - c_1 x^(k-1) - ... - c_k``, so every ``x^i`` with ``i >= k``
+    can be replaced by ``c_1 x^(i-1) + ... + c_k x^(i-k)``.
+    """
+    k = len(coefficients)
+    product = [0] * (len(a) + len(b) - 1)
+    for i, ai in enumerate(a):
+        if ai:
+            for j, bj in enumerate(b):
+                product[i + j] = (product[i + j] + ai * bj) % modulo
+    for i in range(len(product) - 1, k - 1, -1):
+        if product[i]:
+            for d, c in enumerate(coefficients, 1):
+                product[i - d] = (product[i - d] + product[i] * c) % modulo
+    return product[:k]
+
+
+def _linear_recurrence_term(
+        coefficients: list[int], initial: list[int], n: int,
+        modulo: int) -> int:
+    """Return term n of ``f(x) = c_1 f(x-1) + ... + c_k f(x-k)``, modulo.
+
+    ``initial`` holds the first k terms. This is Kitamasa's method: term n
+    is a combination of the first k terms, whose weights are the
+    coefficients of ``x^n`` modulo the characteristic polynomial, found by
+    repeated squaring in O(k^2 log n).
+    """
+    if n < len(initial):
+        return initial[n] % modulo
+    result = [1]
+    power = [0, 1]
+    while n:
+        if n & 1:
+            result = _multiply_modulo_recurrence(
+                result, power, coefficients, modulo)
+        power = _multiply_modulo_recurrence(
+            power, power, coefficients, modulo)
+        n >>= 1
+    return sum(r * f for r, f in zip(result, initial)) % modulo
 
 
 class CoinSolver:
+    """Minimum coins and number of ways for every amount, computed once.
+
+    The tables are indexed by amount and only ever grow: ``solve(n)`` starts
+    from the largest amount already computed, and answers smaller amounts
+    straight from the tables. ``solutions`` and ``first_coins`` are compact
+    arrays of machine integers, with -1 and 0 for unreachable amounts.
+    ``count`` stays a list, since the number of ways grows without bound.
+    """
     coins: list[int]
-    solutions: dict[int, int]
-    first_coins: dict[int, int]
+    solutions: array
+    first_coins: array
     first_coin: int
-    count: dict[int, int]
+    count: list[int]
+    period_start: int | None
 
     def __init__(self, coins: list[int]) -> None:
         self.coins = coins
-        self.solutions = {0: 0}
-        self.first_coins = dict()
+        self.solutions = array("l", [0])
+        self.first_coins = array("l", [0])
         self.first_coin = 0
-        self.count = {0: 1}
+        self.count = [1]
+        self.period_start = None
 
-    def solve(self, n: int) -> int:
-        for x in range(1, n+1):
-            self.solutions[x] = None
-            self.count[x] = 0
+    def _extend(self, n: int) -> None:
+        solutions = self.solutions
+        count = self.count
+        for x in range(len(solutions), n+1):
+            solution = -1
+            first_coin = 0
+            ways = 0
             for c in self.coins:
                 if x - c >= 0:
-                    self.count[x] += self.count[x-c]
-                    if (self.solutions[x] is None
-                            or self.solutions[x-c] + 1 < self.solutions[x]):
-                        self.solutions[x] = self.solutions[x-c] + 1
-                        self.first_coins[x] = c
+                    ways += count[x-c]
+                    if (solutions[x-c] >= 0
+                            and (solution < 0
+                                 or solutions[x-c] + 1 < solution)):
+                        solution = solutions[x-c] + 1
+                        first_coin = c
+            solutions.append(solution)
+            self.first_coins.append(first_coin)
+            count.append(ways)
+
+    def solve(self, n: int) -> int | None:
+        """Return the minimum number of coins adding up to n, or None."""
+        self._extend(n)
         self.first_coin = self.first_coins[n]
+        if self.solutions[n] < 0:
+            return None
         return self.solutions[n]
 
+    def _find_period_start(self) -> None:
+        """Find from which amount on the largest coin is always used.
+
+        Take any cmax coins smaller than the largest one, cmax. Two of their
+        cmax + 1 prefix sums are equal modulo cmax, so some of those coins
+        add up to a multiple of cmax, and can be replaced by fewer coins of
+        cmax. Then, an optimal solution has less than cmax smaller coins,
+        adding up to less than cmax * (cmax - 1), and any amount from there
+        on is solved by one coin of cmax plus the solution of the rest:
+        ``solutions[x] == solutions[x - cmax] + 1``, and both are unreachable
+        or neither is. That bound is computed, and then the lowest amount
+        from which the relation holds is searched backwards from it.
+        """
+        largest = max(self.coins)
+        bound = max(largest * (largest - 1), largest)
+        self._extend(bound)
+        start = bound
+        while start > largest:
+            x = start - 1
+            before = self.solutions[x - largest]
+            expected = before + 1 if before >= 0 else -1
+            if self.solutions[x] != expected:
+                break
+            start = x
+        self.period_start = start
+
+    def solve_large(self, n: int) -> int | None:
+        """Return the minimum number of coins adding up to n, or None.
+
+        Only the amounts up to around the square of the largest coin are
+        computed, once. Any larger amount is reduced by a multiple of the
+        largest coin to an amount in the table, in O(1).
+        """
+        if self.period_start is None:
+            self._find_period_start()
+        if n < len(self.solutions):
+            return self.solve(n)
+        largest = max(self.coins)
+        k = (n - self.period_start) // largest + 1
+        rest = self.solve(n - k * largest)
+        if rest is None:
+            return None
+        return rest + k
+
+    def count_modulo(
+            self, n: int, modulo: int, ordered: bool = True) -> "np.ndarray":
+        """Return the number of ways to form every amount up to n, modulo.
+
+        With ``ordered``, coins are picked in order, like ``count``: 1+2 and
+        2+1 are different ways. Otherwise, only the multiset of coins counts.
+        Everything is kept in a NumPy ``int64`` array, reduced modulo, so
+        numbers never grow.
+
+        Unordered ways are counted coin by coin: with coin c, every amount
+        adds the ways of the amount c below it, which is a running sum over
+        the amounts with the same remainder modulo c, done for all of them
+        at once. Ordered ways need every coin for every amount, so they are
+        computed in blocks as long as the smallest coin, since no amount in
+        a block depends on another one of the same block.
+
+        Sums are reduced before they can overflow ``int64``, which requires
+        ``modulo`` below 2^62.
+        """
+        if np is None:
+            raise ImportError("NumPy is required to count modulo")
+        if modulo >= 1 << 62:
+            raise ValueError("Modulo must be below 2^62")
+        # How many values below the modulo can be added up in an int64
+        terms = ((1 << 63) - 1) // modulo
+        ways = np.zeros(n + 1, dtype=np.int64)
+        ways[0] = 1 % modulo
+        if not ordered:
+            for c in self.coins:
+                length = -(-(n + 1) // c) * c
+                padded = np.zeros(length, dtype=np.int64)
+                padded[:n + 1] = ways
+                by_remainder = padded.reshape(-1, c)
+                # Running sums over chunks of rows, carrying the last row of
+                # each chunk into the next one
+                for start in range(0, len(by_remainder), terms - 1):
+                    chunk = by_remainder[start:start + terms - 1]
+                    if start:
+                        chunk[0] += by_remainder[start - 1]
+                    np.cumsum(chunk, axis=0, out=chunk)
+                    chunk %= modulo
+                ways = padded[:n + 1]
+            return ways
+        block = min(self.coins)
+        for start in range(1, n + 1, block):
+            stop = min(start + block, n + 1)
+            for c in self.coins:
+                if stop - 1 - c >= 0:
+                    low = max(start, c)
+                    ways[low:stop] += ways[low - c:stop - c]
+                    ways[low:stop] %= modulo
+        return ways
+
+    def count_large(self, n: int, modulo: int, ordered: bool = True) -> int:
+        """Return the number of ways to form n, modulo, in O(k^2 log n).
+
+        The number of ways follows a linear recurrence. With ``ordered``,
+        ``f(x)`` is the sum of ``f(x - c)`` over all coins, of order k equal
+        to the largest coin. Otherwise, the generating function is
+        ``1 / ((1 - x^c_1) ... (1 - x^c_m))``, so the coefficients come from
+        expanding that denominator, of order k equal to the sum of the
+        coins. The first k terms are computed with ``count_modulo``.
+        """
+        if ordered:
+            coefficients = [0] * max(self.coins)
+            for c in self.coins:
+                coefficients[c - 1] = 1
+        else:
+            denominator = [1]
+            for c in self.coins:
+                shifted = [0] * c + [-d for d in denominator]
+                denominator = [
+                    (denominator[i] if i < len(denominator) else 0)
+                    + shifted[i]
+                    for i in range(len(shifted))
+                ]
+            coefficients = [-d % modulo for d in denominator[1:]]
+        initial = [
+            int(ways)
+            for ways in self.count_modulo(
+                len(coefficients) - 1, modulo, ordered)
+        ]
+        return _linear_recurrence_term(coefficients, initial, n, modulo)
+
+    def reconstruct(self, n: int) -> list[int] | None:
+        """Return the coins of an optimal solution for n, or None."""
+        if self.solve(n) is None:
+            return None
+        coins = []
+        while n > 0:
+            coins.append(self.first_coins[n])
+            n -= self.first_coins[n]
+        return coins
+
 
 if __name__ == "__main__":
     coins = [1, 2, 5, 10, 20, 50, 100, 200]
@@ -60,11 +273,19 @@ if __name__ == "__main__":
     print("This way we can even see what's the first coin of any given solution:")
     print(solver_general.first_coin)
     print("And these are all the coins in the solution:")
-    n_coins = n
-    all_coins = []
-    while n_coins > 0:
-        coin = solver_general.first_coins[n_coins]
-        all_coins.append(str(coin))
-        n_coins -= coin
-    print("+".join(all_coins))
+    print("+".join(str(coin) for coin in solver_general.reconstruct(n)))
     print(f"And there are this many solutions for this problem: {solver_general.count[n]}")
+    n = 10**12 + 3
+    print("For really large amounts, at some point the largest coin is always "
+          "part of the solution, so we don't need to build the whole table. "
+          f"This is the solution for {n}:")
+    print(solver_general.solve_large(n))
+    modulo = 10**9 + 7
+    print("The number of ways grows too fast, so let's count them modulo "
+          f"{modulo}, with and without taking the order into account:")
+    print(solver_general.count_large(n, modulo))
+    print(solver_general.count_large(n, modulo, ordered=False))
+    coins = [4, 6]
+    solver_even = CoinSolver(coins)
+    print(f"Not every amount can be reached with {coins}, though:")
+    print(solver_even.solve_large(n))
@@ -5,6 +5,14 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 """Solving knapsack problems."""
+from collections import Counter, deque
+from random import randint, seed
+from time import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 def determine_all_sums(w: list[int]) -> list[int]:
@@ -50,6 +58,231 @@ def optimum_all_sums(w: list[int]) -> list[int]:
     ]
 
 
+def _decode_bitset(reach: int) -> list[int]:
+    """Return the positions of the bits set in an integer, in order."""
+    if np is not None:
+        length = (reach.bit_length() + 7) // 8
+        bits = np.unpackbits(
+            np.frombuffer(reach.to_bytes(length, "little"), dtype=np.uint8),
+            bitorder="little")
+        return np.flatnonzero(bits).tolist()
+    digits = bin(reach)[:1:-1]
+    sums = []
+    i = digits.find("1")
+    while i >= 0:
+        sums.append(i)
+        i = digits.find("1", i + 1)
+    return sums
+
+
+def bitset_all_sums(w: list[int]) -> list[int]:
+    """Same result as ``optimum_all_sums``, with a single integer as bitset.
+
+    Bit x of ``reach`` tells whether sum x can be built. Adding a weight
+    shifts every reachable sum at once, ``reach | reach << weight``, which
+    Python runs over whole machine words instead of one sum at a time.
+    """
+    reach = 1
+    for weight in w:
+        reach |= reach << weight
+    return _decode_bitset(reach)
+
+
+def _best_values(
+        weights: list[int], values: list[int], capacity: int,
+        use_numpy: bool) -> list[int]:
+    """Return the best value of the items for every capacity up to the given.
+
+    Only one row of the table is kept, and capacities are updated from the
+    largest down so every item is used once at most.
+    """
+    if use_numpy:
+        best = np.zeros(capacity + 1, dtype=np.int64)
+        for weight, value in zip(weights, values):
+            if weight == 0:
+                best += max(value, 0)
+            elif weight <= capacity:
+                best[weight:] = np.maximum(
+                    best[weight:], best[:-weight] + value)
+        return best.tolist()
+    best = [0] * (capacity + 1)
+    for weight, value in zip(weights, values):
+        for c in range(capacity, weight - 1, -1):
+            if best[c - weight] + value > best[c]:
+                best[c] = best[c - weight] + value
+    return best
+
+
+def _split_capacity(
+        weights: list[int], values: list[int], capacity: int, start: int,
+        middle: int, stop: int, use_numpy: bool) -> int:
+    """Return the share of capacity that the items before middle should get.
+
+    Both rows are freed when this returns, so only the rows of the current
+    split are in memory at any time.
+    """
+    left = _best_values(
+        weights[start:middle], values[start:middle], capacity, use_numpy)
+    right = _best_values(
+        weights[middle:stop], values[middle:stop], capacity, use_numpy)
+    return max(
+        range(capacity + 1), key=lambda c: left[c] + right[capacity - c])
+
+
+def _choose_items(
+        weights: list[int], values: list[int], capacity: int, start: int,
+        stop: int, use_numpy: bool, chosen: list[int]) -> int:
+    """Add the best items from start to stop to chosen, return their value."""
+    if stop - start == 1:
+        if weights[start] <= capacity and values[start] > 0:
+            chosen.append(start)
+            return values[start]
+        return 0
+    middle = (start + stop) // 2
+    split = _split_capacity(
+        weights, values, capacity, start, middle, stop, use_numpy)
+    return (
+        _choose_items(weights, values, split, start, middle, use_numpy, chosen)
+        + _choose_items(
+            weights, values, capacity - split, middle, stop, use_numpy,
+            chosen))
+
+
+def knapsack_max_value(
+        weights: list[int], values: list[int], capacity: int,
+        use_numpy: bool = False) -> tuple[int, list[int]]:
+    """Return the best total value within capacity, and the items chosen.
+
+    Items are used once at most. The table of best values takes O(n W)
+    time, but only one row of it, O(W), is kept in memory. To find the items
+    without the full table, as Hirschberg does for edit distances, the
+    items are split in two halves, the best value of each half is computed
+    for every capacity, and the capacity is split where their sum is
+    largest. Each half is then solved recursively with its share of the
+    capacity, which in total takes at most twice the time. The rows of a
+    split are freed before recursing, and the best value is the sum of the
+    values of the items chosen, so no extra pass over all items is needed.
+
+    With ``use_numpy``, every item updates the row with one NumPy operation.
+    """
+    if use_numpy and np is None:
+        raise ImportError("NumPy is required for use_numpy=True")
+    if not weights:
+        return 0, []
+    chosen = []
+    best = _choose_items(
+        weights, values, capacity, 0, len(weights), use_numpy, chosen)
+    return best, chosen
+
+
+def group_weights(w: list[int]) -> list[tuple[int, int]]:
+    """Turn a list of weights into (weight, count) pairs."""
+    return sorted(Counter(w).items())
+
+
+def bounded_all_sums(items: list[tuple[int, int]]) -> list[int]:
+    """Same result as ``bitset_all_sums``, for (weight, count) pairs.
+
+    Taking up to ``count`` copies of a weight is the same as choosing from
+    groups of 1, 2, 4, ... copies plus the rest, since every number up to
+    count is a sum of some of those groups. So each pair costs O(log count)
+    shifts of the bitset instead of ``count``.
+    """
+    reach = 1
+    for weight, count in items:
+        group = 1
+        while count > 0:
+            copies = min(group, count)
+            reach |= reach << (weight * copies)
+            count -= copies
+            group *= 2
+    return _decode_bitset(reach)
+
+
+def bounded_knapsack_max_value(
+        items: list[tuple[int, int, int]], capacity: int) -> int:
+    """Return the best value within capacity for (weight, value, count) items.
+
+    Adding up to k copies of an item of weight w and value v, the best value
+    for capacity ``c = r + j w`` is the best, for t from j - k to j, of
+    ``old[r + t w] + (j - t) v``, which is ``j v`` plus the best of
+    ``old[r + t w] - t v`` over a window of k + 1 positions. For every
+    remainder r, that window slides with j, and a deque keeps the positions
+    that can still be the best of it, in decreasing order of value. This
+    costs O(W) per item, whatever its count is.
+    """
+    best = [0] * (capacity + 1)
+    for weight, value, count in items:
+        if weight == 0:
+            best = [b + count * max(value, 0) for b in best]
+            continue
+        new_best = best[:]
+        for r in range(min(weight, capacity + 1)):
+            window = deque()
+            for j, c in enumerate(range(r, capacity + 1, weight)):
+                candidate = best[c] - j * value
+                while window and window[-1][1] <= candidate:
+                    window.pop()
+                window.append((j, candidate))
+                if window[0][0] < j - count:
+                    window.popleft()
+                new_best[c] = window[0][1] + j * value
+        best = new_best
+    return best[capacity]
+
+
+class ReachableSums:
+    """Sums that can be built with a changing collection of weights.
+
+    Instead of whether each sum can be built, ``ways`` keeps in how many
+    ways it can, modulo a large prime. Unlike a boolean, a count can be
+    undone: adding weight w is the usual update from the largest sum down,
+    ``ways[x] += ways[x - w]``, and removing it runs the same update
+    backwards, from the smallest sum up, subtracting. Both take O(S), where
+    S is the sum of all weights, and checking a sum takes O(1).
+
+    A sum whose number of ways is a multiple of the prime would be reported
+    as unreachable, which is extremely unlikely with a prime this large.
+    """
+    modulo: int = (1 << 61) - 1
+    weights: Counter
+    ways: list[int]
+
+    def __init__(self, w: list[int] | None = None) -> None:
+        self.weights = Counter()
+        self.ways = [1]
+        for weight in w or []:
+            self.add(weight)
+
+    def add(self, weight: int) -> None:
+        self.weights[weight] += 1
+        ways = self.ways
+        ways.extend([0] * weight)
+        for x in range(len(ways) - 1, weight - 1, -1):
+            ways[x] = (ways[x] + ways[x - weight]) % self.modulo
+
+    def remove(self, weight: int) -> None:
+        if self.weights[weight] == 0:
+            raise ValueError(f"Weight {weight} is not in the collection")
+        self.weights[weight] -= 1
+        ways = self.ways
+        if weight == 0:
+            # Adding a zero doubled every count, so halve them back
+            half = (self.modulo + 1) // 2
+            self.ways = [count * half % self.modulo for count in ways]
+            return
+        for x in range(weight, len(ways)):
+            ways[x] = (ways[x] - ways[x - weight]) % self.modulo
+        del ways[len(ways) - weight:]
+
+    def is_reachable(self, x: int) -> bool:
+        return 0 <= x < len(self.ways) and self.ways[x] != 0
+
+    def sums(self) -> list[int]:
+        """Same result as ``optimum_all_sums`` for the current weights."""
+        return [x for x, ways in enumerate(self.ways) if ways]
+
+
 if __name__ == "__main__":
     weights = [1, 3, 3, 5]
     print("Suppose we have the following weights, in order")
@@ -60,3 +293,47 @@ if __name__ == "__main__":
     print("We need to store all sums as we go through them.")
     print("This algorithm is more optimal, however")
     print(optimum_all_sums(weights))
+    print("We can also keep all the sums as the bits of a single number")
+    print(bitset_all_sums(weights))
+    seed(0)
+    weights = [randint(1, 10**6) for _ in range(50)]
+    print(f"That scales to large sums. These weights add up to {sum(weights)}")
+    start_time = time()
+    sums = bitset_all_sums(weights)
+    execution_time = time() - start_time
+    print(f"There are {len(sums)} sums, found in {execution_time} seconds.")
+    weights = [4, 3, 5, 2, 6]
+    values = [10, 7, 13, 4, 15]
+    capacity = 10
+    print(f"If the weights {weights} have the values {values}, what's the "
+          f"best value we can carry with a capacity of {capacity}, and which "
+          "items should we take?")
+    print(knapsack_max_value(weights, values, capacity))
+    weights = [3] * 1000 + [7] * 500 + [10] * 2000
+    print("When weights are repeated many times, we can group them instead")
+    print(group_weights(weights))
+    start_time = time()
+    sums = optimum_all_sums(weights)
+    execution_time = time() - start_time
+    print(f"Taking them one by one, there are {len(sums)} sums, found in "
+          f"{execution_time} seconds.")
+    start_time = time()
+    sums = bounded_all_sums(group_weights(weights))
+    execution_time = time() - start_time
+    print(f"Grouping them, there are {len(sums)} sums, found in "
+          f"{execution_time} seconds.")
+    items = [(4, 10, 3), (3, 7, 5), (5, 13, 2)]
+    capacity = 20
+    print(f"Given (weight, value, count) items {items}, the best value we can "
+          f"carry with a capacity of {capacity} is:")
+    print(bounded_knapsack_max_value(items, capacity))
+    weights = [1, 3, 3, 5]
+    print(f"If weights come and go, we can keep the sums of {weights} up to "
+          "date without starting over")
+    reachable = ReachableSums(weights)
+    print(reachable.sums())
+    reachable.remove(3)
+    reachable.add(10)
+    print(f"After replacing a 3 with a 10, can we build 14? "
+          f"{reachable.is_reachable(14)}")
+    print(reachable.sums())
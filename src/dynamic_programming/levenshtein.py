@@ -5,6 +5,8 @@
 # This source code is licensed under the BSD-style license found in the
 # LICENSE file in the root directory of this source tree.
 """Calculate number of editions needed to turn one word into another."""
+from random import choice, randint, seed
+from time import time
 
 
 def levenshtein(x: str, y: str) -> int:
@@ -43,6 +45,81 @@ def levenshtein(x: str, y: str) -> int:
     return distance[-1][-1]
 
 
+def levenshtein_two_rows(x: str, y: str) -> int:
+    """Same result as ``levenshtein``, keeping only two rows of the table.
+
+    Every row only depends on the previous one, so memory is O(min(m, n)),
+    making the shorter word the one along the rows.
+    """
+    if len(x) > len(y):
+        x, y = y, x
+    previous = list(range(len(x) + 1))
+    for j, b in enumerate(y, 1):
+        current = [j]
+        for i, a in enumerate(x, 1):
+            current.append(min(
+                current[i-1] + 1,
+                previous[i] + 1,
+                previous[i-1] + (a != b),
+            ))
+        previous = current
+    return previous[-1]
+
+
+def levenshtein_bit_parallel(x: str, y: str) -> int:
+    """Same result as ``levenshtein``, with a whole column in a few integers.
+
+    This is Myers' algorithm, as adapted by Hyyrö to edit distances. Going
+    down a column of the table, every cell differs from the one above by
+    -1, 0 or +1, so a column is two bit vectors: where it goes up (``vp``)
+    and where it goes down (``vm``). Each character of y updates both
+    vectors at once with a handful of bitwise operations and one addition
+    on Python integers, so the cost is O(ceil(m / w) n) for words of w bits,
+    and the last cell of the column is followed along as the distance.
+    """
+    if len(x) > len(y):
+        x, y = y, x
+    if not x:
+        return len(y)
+    mask = (1 << len(x)) - 1
+    last = 1 << (len(x) - 1)
+    # Positions of every character in x
+    matches = {}
+    for i, a in enumerate(x):
+        matches[a] = matches.get(a, 0) | 1 << i
+    vp = mask
+    vm = 0
+    distance = len(x)
+    for b in y:
+        eq = matches.get(b, 0)
+        xv = eq | vm
+        xh = ((((eq & vp) + vp) & mask) ^ vp) | eq
+        hp = vm | (~(xh | vp) & mask)
+        hm = vp & xh
+        if hp & last:
+            distance += 1
+        elif hm & last:
+            distance -= 1
+        # The first row of the table grows by one in every column
+        hp = ((hp << 1) | 1) & mask
+        hm = (hm << 1) & mask
+        vp = hm | (~(xv | hp) & mask)
+        vm = hp & xv
+    return distance
+
+
+def edit_distance(x: str, y: str) -> int:
+    """Same result as ``levenshtein``, picking the best engine for the words.
+
+    The bit parallel engine is the fastest as soon as the shorter word has
+    more than a couple of characters; below that, building its bit vectors
+    costs as much as filling the two rows.
+    """
+    if min(len(x), len(y)) <= 2:
+        return levenshtein_two_rows(x, y)
+    return levenshtein_bit_parallel(x, y)
+
+
 if __name__ == "__main__":
     x = "love"
     y = "movie"
@@ -53,3 +130,42 @@ if __name__ == "__main__":
     y = "goodbye"
     print(f"What about words {x} and {y}?")
     print(levenshtein(x, y))
+    seed(0)
+    print("The faster engines must always agree with the original one. Let's "
+          "check them on a few hundred random pairs of words:")
+    pairs = [("", ""), ("", "abc"), ("abc", "")]
+    for _ in range(500):
+        alphabet = choice(["ab", "ACGT", "abcdefghijklmnopqrstuvwxyz"])
+        pairs.append((
+            "".join(choice(alphabet) for _ in range(randint(0, 40))),
+            "".join(choice(alphabet) for _ in range(randint(0, 80))),
+        ))
+    mismatches = 0
+    for x, y in pairs:
+        expected = levenshtein(x, y)
+        for engine in (
+                levenshtein_two_rows, levenshtein_bit_parallel,
+                edit_distance):
+            if engine(x, y) != expected:
+                mismatches += 1
+                print(f"{engine.__name__}({x!r}, {y!r}) is {engine(x, y)}, "
+                      f"not {expected}")
+    print(f"There were {mismatches} mismatches.")
+    x = "".join(choice("ACGT") for _ in range(2000))
+    y = "".join(choice("ACGT") for _ in range(2000))
+    print("What about two random DNA sequences of 2000 characters?")
+    for engine in (
+            levenshtein, levenshtein_two_rows, levenshtein_bit_parallel,
+            edit_distance):
+        start_time = time()
+        print(engine(x, y))
+        execution_time = time() - start_time
+        print(f"{engine.__name__} took {execution_time} seconds.")
+    x = "".join(choice("ACGT") for _ in range(randint(10000, 20000)))
+    y = "".join(choice("ACGT") for _ in range(randint(10000, 20000)))
+    print(f"The bit parallel engine can even compare {len(x)} and {len(y)} "
+          "characters:")
+    start_time = time()
+    print(edit_distance(x, y))
+    execution_time = time() - start_time
+    print(f"That took {execution_time} seconds.")